@@ -4,25 +4,42 @@ cloudify_deploy.py - Generic Cloudify deploy runner (REST API only)
 
 Features:
 - Cloudify API version configurable (default: v3.1)
-- Token auth via POST /tokens (supports Basic Auth header)
-- Blueprint upload via ZIP archive (built from --blueprint-dir)
+- Token auth via POST /tokens (supports Basic Auth header), cached on disk between runs
+- Blueprint upload via ZIP archive (built from --blueprint-dir), skipped when unchanged
 - Create deployment if missing
 - Run workflow (install/update) and wait for completion
+- Several deployments per run (--deploy), sharing one login and connection pool
 - Retries/backoff for transient failures
+- Single pooled HTTP session (keep-alive) for all API calls
 """
 
 import argparse
 import base64
+import hashlib
+import io
 import json
+import logging
 import os
+import stat
 import sys
+import tempfile
+import threading
 import time
 import zipfile
-from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
 import requests
 import yaml
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson isn't installed
+    orjson = None
 
 
 # -------------------------
@@ -33,8 +50,15 @@ class CloudifyAPIError(RuntimeError):
     pass
 
 
+class CloudifyAuthError(CloudifyAPIError):
+    """HTTP 401 on an authenticated call (token expired/revoked)."""
+
+
+logger = logging.getLogger("cloudify_deploy")
+
+
 def log(msg: str) -> None:
-    print(msg, flush=True)
+    logger.info(msg)
 
 
 def die(msg: str, code: int = 1) -> None:
@@ -46,39 +70,102 @@ def str_to_bool(s: str) -> bool:
     return str(s).strip().lower() in ("1", "true", "yes", "y", "on")
 
 
+# LibYAML-backed loader when PyYAML was built with it; same safe semantics.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
 def load_yaml_file(path: str) -> Dict[str, Any]:
     if not path:
         return {}
     if not os.path.exists(path):
         die(f"File not found: {path}")
     with open(path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
+        data = yaml.load(f, Loader=_YAML_LOADER) or {}
     if not isinstance(data, dict):
         die(f"YAML top-level must be a mapping/object: {path}")
     return data
 
 
 def merge_dicts(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Recursive merge: nested mappings are merged key by key, anything else in
+    override replaces the value from base.
+    """
     out = dict(base)
-    out.update(override)
+    for k, v in override.items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = merge_dicts(out[k], v)
+        else:
+            out[k] = v
     return out
 
 
-def build_zip_from_dir(src_dir: str, out_zip: str, root_dir_name: str) -> None:
+# Already-compressed formats: DEFLATE only burns CPU on these, so store them as-is.
+COMPRESSED_EXTS = {".gz", ".tgz", ".zip", ".whl", ".xz", ".bz2", ".png", ".jpg", ".jpeg"}
+
+
+def _iter_files(d: str) -> Iterator[os.DirEntry]:
+    """
+    Recursive os.scandir walk yielding regular files (symlinked dirs aren't followed, like os.walk).
+    """
+    with os.scandir(d) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                yield from _iter_files(e.path)
+            elif e.is_file():
+                yield e
+
+
+def build_zip_from_dir(src_dir: str, root_dir_name: str) -> io.BytesIO:
     """
     Cloudify (some versions/configs) require the blueprint archive to contain exactly
-    one top-level directory. This function zips src_dir into out_zip under root_dir_name/.
+    one top-level directory. This function zips src_dir under root_dir_name/ into an
+    in-memory buffer (no temp file write/read/delete round trip).
+    The archive is reproducible (sorted entries, fixed timestamps, modes normalized to
+    0644/0755) so its hash only changes when blueprint content or exec bits do.
     """
     if not os.path.isdir(src_dir):
-        die(f"Blueprint directory not found: {src_dir}")
+        # may run on a pool thread: raise rather than sys.exit() (main() checks dirs up front)
+        raise FileNotFoundError(f"Blueprint directory not found: {src_dir}")
+
+    prefix = len(os.path.join(src_dir, ""))
+    entries = sorted(_iter_files(src_dir), key=lambda e: e.path)
+    buf = io.BytesIO()
+    # compression is set per entry: writestr() with a ZipInfo ignores ZipFile-level defaults
+    with zipfile.ZipFile(buf, "w") as z:
+        for e in entries:
+            arcname = root_dir_name + "/" + e.path[prefix:].replace(os.sep, "/")  # <- one top-level dir
+            if os.path.splitext(e.name)[1].lower() in COMPRESSED_EXTS:
+                ct = zipfile.ZIP_STORED
+            else:
+                ct = zipfile.ZIP_DEFLATED
+            zinfo = zipfile.ZipInfo.from_file(e.path, arcname)
+            zinfo.date_time = (1980, 1, 1, 0, 0, 0)  # checkout mtimes vary between CI runs
+            # git only tracks the exec bit; the rest of the mode depends on the agent's umask
+            zinfo.external_attr = (0o100755 if os.access(e.path, os.X_OK) else 0o100644) << 16
+            with open(e.path, "rb") as f:
+                # level 1: blueprints are small text trees, speed matters more than ratio
+                z.writestr(zinfo, f.read(), compress_type=ct, compresslevel=1)
+    return buf
+
+
+class BufferChunks:
+    """
+    Re-iterable request body that streams a buffer in fixed-size chunks.
+    len() lets requests send Content-Length instead of chunked encoding, and each
+    iteration starts from the beginning so a retried request resends the full body.
+    """
+
+    def __init__(self, buf: io.BytesIO, chunk_size: int = 1 << 20) -> None:
+        self.view = buf.getbuffer()
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return self.view.nbytes
 
-    with zipfile.ZipFile(out_zip, "w", zipfile.ZIP_DEFLATED) as z:
-        for root, _, files in os.walk(src_dir):
-            for name in files:
-                full = os.path.join(root, name)
-                rel = os.path.relpath(full, src_dir)
-                arcname = os.path.join(root_dir_name, rel)  # <- one top-level dir
-                z.write(full, arcname)
+    def __iter__(self) -> Iterator[memoryview]:
+        for i in range(0, self.view.nbytes, self.chunk_size):
+            yield self.view[i:i + self.chunk_size]
 
 
 
@@ -86,6 +173,10 @@ def build_zip_from_dir(src_dir: str, out_zip: str, root_dir_name: str) -> None:
 # Cloudify API client
 # -------------------------
 
+# Parses response bytes directly (orjson skips the bytes->str decode).
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
 @dataclass
 class CfyConfig:
     manager_url: str
@@ -97,82 +188,194 @@ class CfyConfig:
     request_timeout_sec: int  # per-request timeout
     exec_timeout_sec: int     # overall execution wait timeout
     poll_interval_sec: int    # poll interval
+    token_cache: bool = True  # reuse auth token across runs (see _load_cached_token)
+    session: Optional[requests.Session] = None  # shared keep-alive session (see build_session)
+    _basic_auth_header: str = field(default="", init=False, repr=False)
+    _api_root: str = field(default="", init=False, repr=False)
 
+    def __post_init__(self) -> None:
+        basic = base64.b64encode(f"{self.username}:{self.password}".encode("utf-8")).decode("utf-8")
+        self._basic_auth_header = f"Basic {basic}"
 
-def api_url(cfg: CfyConfig, path: str) -> str:
-    base = cfg.manager_url.rstrip("/")
-    ver = cfg.api_version.strip("/")
+        # allow user to pass "v3.1" or "api/v3.1"
+        ver = self.api_version.strip("/").removeprefix("api/")
+        self._api_root = f"{self.manager_url.rstrip('/')}/api/{ver}/"
+
+
+# Worker threads in main()'s deploy pool. The session's connection pool has the
+# same size, so every worker can keep its own keep-alive connection.
+MAX_PARALLEL = 8
+
+
+def build_session(cfg: CfyConfig, retries: int = 4, backoff_sec: float = 1.0) -> requests.Session:
+    """
+    One pooled session per run, so auth/upload/create/poll reuse the same
+    TCP+TLS connection instead of reconnecting on every call.
+    Transient failures (connection errors, timeouts, 429/5xx) are retried by urllib3
+    with exponential backoff, honoring the server's Retry-After header.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_sec,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "PUT", "POST", "HEAD"],
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the final 5xx back to the caller for its own error message
+    )
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_PARALLEL, max_retries=retry)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.verify = not cfg.insecure
+
+    # Always include tenant if provided (Cloudify may require it for authorization)
+    if cfg.tenant:
+        s.headers.update({"Tenant": cfg.tenant})
+    return s
 
-    # allow user to pass "v3.1" or "api/v3.1"
-    if ver.startswith("api/"):
-        ver = ver[4:]
 
-    return f"{base}/api/{ver}/{path.lstrip('/')}"
+def api_url(cfg: CfyConfig, path: str) -> str:
+    return cfg._api_root + path.lstrip("/")
 
 
 def _request(
     cfg: CfyConfig,
     method: str,
     url: str,
-    token: Optional[str] = None,
-    headers: Optional[Dict[str, str]] = None,
+    headers: Optional[Dict[str, Optional[str]]] = None,
     params: Optional[Dict[str, str]] = None,
     json_body: Optional[Any] = None,
     data_body: Optional[Any] = None,
     content_type: Optional[str] = None,
-    retries: int = 5,
-    backoff_sec: float = 1.0,
 ) -> Tuple[int, str, Dict[str, Any]]:
     """
     Returns: (status_code, raw_text, json_dict_or_empty)
-    Retries on transient errors (5xx, timeouts, connection issues).
+    Transient errors are retried by the session (see build_session).
+    Tenant and Authentication-Token come from the session's default headers.
     """
-    h = dict(headers or {})
+    h = headers
+    if content_type:
+        h = {**(headers or {}), "Content-Type": content_type}
 
-    # Always include tenant if provided (Cloudify may require it for authorization)
-    if cfg.tenant and "Tenant" not in h:
-        h["Tenant"] = cfg.tenant
+    try:
+        resp = cfg.session.request(
+            method=method,
+            url=url,
+            headers=h,
+            params=params,
+            json=json_body,
+            data=data_body,
+            timeout=cfg.request_timeout_sec,
+        )
+    except requests.RequestException as e:
+        raise CloudifyAPIError(f"Request failed after retries: {method} {url}: {e}")
 
-    if token:
-        h["Authentication-Token"] = token
+    parsed: Dict[str, Any] = {}
+    # don't JSON-probe binary uploads
+    if resp.content and content_type != "application/zip":
+        try:
+            parsed = _json_loads(resp.content)
+        except ValueError:
+            parsed = {}
+    # raw text is only needed for error messages / non-JSON bodies
+    text = (resp.text or "") if resp.status_code >= 400 or not parsed else ""
+    if resp.status_code == 401 and "Authentication-Token" in resp.request.headers:
+        raise CloudifyAuthError(f"HTTP 401 for {method} {url}: {text}")
+    return resp.status_code, text, parsed
 
-    if content_type:
-        h["Content-Type"] = content_type
 
-    last_exc = None
-    for attempt in range(1, retries + 1):
+# Used when the /tokens response carries no expiration_date.
+TOKEN_CACHE_TTL_SEC = 3600
+
+
+def _is_private(st: os.stat_result) -> bool:
+    return st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def _token_cache_dir() -> str:
+    """
+    $XDG_RUNTIME_DIR (per-user by spec), else a per-user 0700 directory under the
+    shared temp dir. Raises OSError if that directory isn't ours and private.
+    """
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return runtime_dir
+    cache_dir = os.path.join(tempfile.gettempdir(), f"cfy-token-cache-{os.getuid()}")
+    try:
+        os.mkdir(cache_dir, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(cache_dir)
+    if not stat.S_ISDIR(st.st_mode) or not _is_private(st):
+        raise OSError(f"Refusing to use token cache dir not private to this user: {cache_dir}")
+    return cache_dir
+
+
+def _token_cache_path(cfg: CfyConfig) -> str:
+    key = hashlib.sha256(f"{cfg.manager_url}|{cfg.username}|{cfg.tenant or ''}".encode("utf-8")).hexdigest()
+    return os.path.join(_token_cache_dir(), f".cfy_token_{key}.json")
+
+
+def _load_cached_token(cfg: CfyConfig) -> Optional[str]:
+    """
+    Returns a previously issued token if it is still valid for at least 30s.
+    Files not owned by us or readable by others, and unreadable/corrupt files, count as a miss.
+    """
+    if not cfg.token_cache:
+        return None
+    try:
+        fd = os.open(_token_cache_path(cfg), os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+        with os.fdopen(fd, "r", encoding="utf-8") as f:
+            if not _is_private(os.fstat(f.fileno())):
+                return None
+            cached = json.load(f)
+        value = cached["value"]
+        exp = float(cached["exp"])
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+    if not isinstance(value, str) or not value:
+        return None
+    if time.time() >= exp - 30:
+        return None
+    return value
+
+
+def _store_cached_token(cfg: CfyConfig, token: str, exp: float) -> None:
+    if not cfg.token_cache:
+        return
+    try:
+        path = _token_cache_path(cfg)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".cfy_token_")
         try:
-            resp = requests.request(
-                method=method,
-                url=url,
-                headers=h,
-                params=params,
-                json=json_body,
-                data=data_body,
-                verify=not cfg.insecure,
-                timeout=cfg.request_timeout_sec,
-            )
-            text = resp.text or ""
-            parsed: Dict[str, Any] = {}
-            if text.strip():
-                try:
-                    parsed = resp.json()
-                except ValueError:
-                    parsed = {}
-            # Retry on 5xx
-            if resp.status_code >= 500 and attempt < retries:
-                log(f"HTTP {resp.status_code} (attempt {attempt}/{retries}) for {method} {url} — retrying...")
-                time.sleep(backoff_sec * attempt)
-                continue
-            return resp.status_code, text, parsed
-        except (requests.Timeout, requests.ConnectionError, requests.RequestException) as e:
-            last_exc = e
-            if attempt >= retries:
-                break
-            log(f"Request error (attempt {attempt}/{retries}) for {method} {url}: {e} — retrying...")
-            time.sleep(backoff_sec * attempt)
+            os.chmod(tmp, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"value": token, "exp": exp}, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError as e:
+        log(f"Could not cache auth token: {e}")
+
+
+def _clear_cached_token(cfg: CfyConfig) -> None:
+    try:
+        os.remove(_token_cache_path(cfg))
+    except OSError:
+        pass
 
-    raise CloudifyAPIError(f"Request failed after retries: {method} {url}: {last_exc}")
+
+def _token_expiry(data: Dict[str, Any]) -> float:
+    """
+    Epoch seconds from the token's expiration_date (ISO 8601), or now + TOKEN_CACHE_TTL_SEC.
+    """
+    raw = data.get("expiration_date")
+    if raw:
+        try:
+            return datetime.fromisoformat(str(raw).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time() + TOKEN_CACHE_TTL_SEC
 
 
 def login_get_token(cfg: CfyConfig) -> str:
@@ -181,9 +384,9 @@ def login_get_token(cfg: CfyConfig) -> str:
     - Authorization: Basic base64(user:pass)
     - body: {"username": "...", "password": "..."}
     We'll do the same.
+    On success the token becomes the session's default Authentication-Token header.
     """
     url = api_url(cfg, "tokens")
-    basic = base64.b64encode(f"{cfg.username}:{cfg.password}".encode("utf-8")).decode("utf-8")
 
     payload: Dict[str, Any] = {"username": cfg.username, "password": cfg.password}
     if cfg.tenant:
@@ -195,7 +398,8 @@ def login_get_token(cfg: CfyConfig) -> str:
         "POST",
         url,
         headers={
-            "Authorization": f"Basic {basic}",
+            "Authorization": cfg._basic_auth_header,
+            "Authentication-Token": None,  # don't send a stale session token to /tokens
         },
         json_body=payload,
         content_type="application/json",
@@ -207,39 +411,90 @@ def login_get_token(cfg: CfyConfig) -> str:
     token = data.get("value")
     if not token:
         # Some environments might return raw text or different fields
-        raise CloudifyAPIError(f"Token not found in response: {text}")
+        raise CloudifyAPIError(f"Token not found in response: {text or data}")
+    _store_cached_token(cfg, token, _token_expiry(data))
+    cfg.session.headers["Authentication-Token"] = token
     return token
 
 
 def upload_blueprint_zip(
     cfg: CfyConfig,
-    token: str,
     blueprint_id: str,
-    blueprint_zip: str,
+    blueprint_zip: io.BytesIO,
     application_file: str,
+    labels: Optional[Dict[str, str]] = None,
 ) -> None:
     url = api_url(cfg, f"blueprints/{blueprint_id}")
     params = {"application_file": application_file}
+    if labels:
+        params["labels"] = ",".join(f"{k}={v}" for k, v in labels.items())
 
-    log(f"Uploading blueprint '{blueprint_id}' (zip={blueprint_zip}, app={application_file})...")
-    with open(blueprint_zip, "rb") as f:
-        status, text, _ = _request(
-            cfg,
-            "PUT",
-            url,
-            token=token,
-            params=params,
-            data_body=f,
-            content_type="application/zip",
-        )
+    body = BufferChunks(blueprint_zip)
+    log(f"Uploading blueprint '{blueprint_id}' (zip={len(body)} bytes, app={application_file})...")
+    status, text, _ = _request(
+        cfg,
+        "PUT",
+        url,
+        params=params,
+        data_body=body,
+        content_type="application/zip",
+    )
     if status >= 400:
         raise CloudifyAPIError(f"Blueprint upload failed (HTTP {status}): {text}")
-    log("Blueprint upload OK.")
+    log(f"Blueprint '{blueprint_id}' upload OK.")
+
+
+# Blueprint label holding the sha256 of the last uploaded archive.
+BLUEPRINT_HASH_LABEL = "gitops-zip-sha256"
+
+
+def blueprint_digest(blueprint_zip: io.BytesIO, application_file: str) -> str:
+    h = hashlib.sha256(blueprint_zip.getbuffer())
+    h.update(b"\0" + application_file.encode("utf-8"))
+    return h.hexdigest()
+
+
+def get_blueprint_hash(cfg: CfyConfig, blueprint_id: str) -> Optional[str]:
+    """
+    Returns the archive hash recorded on an uploaded blueprint, or None if the blueprint
+    is missing, not (fully) uploaded, or carries no hash label.
+    This is only an upload shortcut: a failed lookup also returns None (upload as usual).
+    """
+    url = api_url(cfg, f"blueprints/{blueprint_id}")
+    status, text, data = _request(cfg, "GET", url, params={"_include": "id,state,labels"})
+    if status == 404:
+        return None
+    if status >= 400:
+        log(f"Could not read blueprint '{blueprint_id}' (HTTP {status}), uploading anyway: {text}")
+        return None
+    if data.get("state", "uploaded") != "uploaded":
+        return None
+    for label in data.get("labels") or []:
+        if label.get("key") == BLUEPRINT_HASH_LABEL:
+            return label.get("value")
+    return None
+
+
+def ensure_blueprint(
+    cfg: CfyConfig,
+    blueprint_id: str,
+    blueprint_zip: io.BytesIO,
+    application_file: str,
+) -> None:
+    """
+    Upload the blueprint unless the manager already has this exact archive.
+    """
+    digest = blueprint_digest(blueprint_zip, application_file)
+    if get_blueprint_hash(cfg, blueprint_id) == digest:
+        log(f"Blueprint '{blueprint_id}' unchanged (sha256 {digest[:12]}), skipping upload.")
+        return
+    upload_blueprint_zip(cfg, blueprint_id, blueprint_zip, application_file, labels={BLUEPRINT_HASH_LABEL: digest})
 
 
-def deployment_exists(cfg: CfyConfig, token: str, deployment_id: str) -> bool:
+def deployment_exists(cfg: CfyConfig, deployment_id: str) -> bool:
     url = api_url(cfg, f"deployments/{deployment_id}")
-    status, _, _ = _request(cfg, "GET", url, token=token)
+    # only the id: we just need 200 vs 404, not the whole deployment object
+    status, _, _ = _request(cfg, "GET", url, params={"_include": "id"})
     if status == 404:
         return False
     if status >= 400:
@@ -249,7 +504,6 @@ def deployment_exists(cfg: CfyConfig, token: str, deployment_id: str) -> bool:
 
 def create_deployment(
     cfg: CfyConfig,
-    token: str,
     deployment_id: str,
     blueprint_id: str,
     inputs: Dict[str, Any],
@@ -262,18 +516,16 @@ def create_deployment(
         cfg,
         "PUT",
         url,
-        token=token,
         json_body=payload,
         content_type="application/json",
     )
     if status >= 400:
         raise CloudifyAPIError(f"Deployment create failed (HTTP {status}): {text}")
-    log("Deployment create OK.")
+    log(f"Deployment '{deployment_id}' create OK.")
 
 
 def start_execution(
     cfg: CfyConfig,
-    token: str,
     deployment_id: str,
     workflow_id: str,
     parameters: Optional[Dict[str, Any]] = None,
@@ -288,7 +540,6 @@ def start_execution(
         cfg,
         "POST",
         url,
-        token=token,
         json_body=payload,
         content_type="application/json",
     )
@@ -297,33 +548,46 @@ def start_execution(
 
     exec_id = data.get("id")
     if not exec_id:
-        raise CloudifyAPIError(f"Execution id missing in response: {text}")
+        raise CloudifyAPIError(f"Execution id missing in response: {text or data}")
     log(f"Execution started: {exec_id}")
     return exec_id
 
 
-def wait_execution(cfg: CfyConfig, token: str, exec_id: str) -> None:
+def wait_execution(cfg: CfyConfig, exec_id: str) -> None:
+    """
+    Poll with exponential backoff (0.5s, 1s, 2s, ... capped at poll_interval_sec),
+    so short workflows are detected quickly and long ones don't hammer the manager.
+    """
     url = api_url(cfg, f"executions/{exec_id}")
+    # only fetch what we need for the status check
+    params = {"_include": "id,status,error"}
     deadline = time.time() + cfg.exec_timeout_sec
+    delay = min(0.5, cfg.poll_interval_sec)
+    last_st = None
 
     while True:
-        status, text, data = _request(cfg, "GET", url, token=token)
+        status, text, data = _request(cfg, "GET", url, params=params)
         if status >= 400:
             raise CloudifyAPIError(f"Failed to read execution (HTTP {status}): {text}")
 
         st = data.get("status", "unknown")
-        log(f"Execution {exec_id} status: {st}")
+        if st != last_st:
+            log(f"Execution {exec_id} status: {st}")
+            last_st = st
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Execution {exec_id} status: {st} (unchanged)")
 
         if st == "terminated":
-            log("Execution succeeded.")
+            log(f"Execution {exec_id} succeeded.")
             return
         if st in ("failed", "cancelled"):
-            raise CloudifyAPIError(f"Execution ended with status '{st}': {text}")
+            raise CloudifyAPIError(f"Execution ended with status '{st}': {data.get('error') or text or data}")
 
         if time.time() > deadline:
             raise CloudifyAPIError(f"Timed out waiting for execution {exec_id}. Last status: {st}")
 
-        time.sleep(cfg.poll_interval_sec)
+        time.sleep(delay)
+        delay = min(delay * 2, cfg.poll_interval_sec)
 
 
 # -------------------------
@@ -342,13 +606,21 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--insecure", action="store_true",
                    default=str_to_bool(os.getenv("CFY_INSECURE", "false")),
                    help="Disable TLS verification (self-signed certs). Can also set CFY_INSECURE=true")
+    p.add_argument("--no-token-cache", dest="token_cache", action="store_false",
+                   default=str_to_bool(os.getenv("CFY_TOKEN_CACHE", "true")),
+                   help="Don't reuse/persist the auth token between runs. Can also set CFY_TOKEN_CACHE=false")
 
     # Blueprint/deployment
-    p.add_argument("--blueprint-id", required=True)
-    p.add_argument("--blueprint-dir", required=True, help="Directory containing blueprint.yaml (will be zipped)")
-    p.add_argument("--application-file", default="blueprint.yaml", help="Entry blueprint file inside zip")
-    p.add_argument("--deployment-id", required=True)
+    p.add_argument("--blueprint-id")
+    p.add_argument("--blueprint-dir", help="Directory containing blueprint.yaml (will be zipped)")
+    p.add_argument("--application-file", help="Entry blueprint file inside zip. Default blueprint.yaml")
+    p.add_argument("--deployment-id")
     p.add_argument("--inputs-file", action="append", default=[], help="Inputs YAML file(s). Later files override earlier ones")
+    p.add_argument("--deploy", action="append", default=[], metavar="JSON",
+                   help='Extra deployment, repeatable: {"blueprint_id": ..., "blueprint_dir": ..., '
+                        '"deployment_id": ..., "application_file": ..., "inputs_file": [...], "inputs": {...}}. '
+                        "All deployments share one login and run in parallel. --inputs-file/--application-file "
+                        "only apply to --blueprint-id/--deployment-id; use inputs_file/application_file here")
 
     # Execution behavior
     p.add_argument("--workflow", choices=["install", "update"], default="install")
@@ -357,12 +629,116 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--request-timeout-sec", type=int, default=int(os.getenv("CFY_REQUEST_TIMEOUT_SEC", "60")))
     p.add_argument("--exec-timeout-sec", type=int, default=int(os.getenv("CFY_EXEC_TIMEOUT_SEC", "3600")))
     p.add_argument("--poll-interval-sec", type=int, default=int(os.getenv("CFY_POLL_INTERVAL_SEC", "10")))
+    p.add_argument("--log-level", default=os.getenv("CFY_LOG_LEVEL", "INFO"),
+                   choices=["DEBUG", "INFO", "WARNING", "ERROR"], type=str.upper,
+                   help="Log verbosity (DEBUG also logs every poll). Default INFO")
 
     return p.parse_args()
 
 
+@dataclass
+class DeploySpec:
+    blueprint_id: str
+    blueprint_dir: str
+    deployment_id: str
+    application_file: str
+    inputs: Dict[str, Any]
+
+
+def _spec_from_json(raw: str) -> DeploySpec:
+    try:
+        d = json.loads(raw)
+    except ValueError as e:
+        die(f"Invalid --deploy JSON ({e}): {raw}")
+    if not isinstance(d, dict):
+        die(f"--deploy must be a JSON object: {raw}")
+    missing = [k for k in ("blueprint_id", "blueprint_dir", "deployment_id") if not d.get(k)]
+    if missing:
+        die(f"--deploy missing {', '.join(missing)}: {raw}")
+    for k in ("blueprint_id", "blueprint_dir", "deployment_id", "application_file"):
+        if k in d and not (isinstance(d[k], str) and d[k]):
+            die(f"--deploy '{k}' must be a non-empty string: {raw}")
+
+    files = d.get("inputs_file") or []
+    if isinstance(files, str):
+        files = [files]
+    if not isinstance(files, list) or not all(isinstance(f, str) for f in files):
+        die(f"--deploy 'inputs_file' must be a path or a list of paths: {raw}")
+    inline = d.get("inputs") or {}
+    if not isinstance(inline, dict):
+        die(f"--deploy 'inputs' must be a JSON object: {raw}")
+
+    inputs: Dict[str, Any] = {}
+    for fpath in files:
+        inputs = merge_dicts(inputs, load_yaml_file(fpath))
+    inputs = merge_dicts(inputs, inline)
+
+    return DeploySpec(
+        blueprint_id=d["blueprint_id"],
+        blueprint_dir=d["blueprint_dir"],
+        deployment_id=d["deployment_id"],
+        application_file=d.get("application_file", "blueprint.yaml"),
+        inputs=inputs,
+    )
+
+
+def collect_specs(args: argparse.Namespace) -> List[DeploySpec]:
+    """
+    The --blueprint-id/--blueprint-dir/--deployment-id flags (if given) plus every --deploy.
+    """
+    specs: List[DeploySpec] = []
+    single = (args.blueprint_id, args.blueprint_dir, args.deployment_id)
+    if any(single):
+        if not all(single):
+            die("--blueprint-id, --blueprint-dir and --deployment-id must be given together")
+        merged_inputs: Dict[str, Any] = {}
+        for fpath in args.inputs_file:
+            merged_inputs = merge_dicts(merged_inputs, load_yaml_file(fpath))
+        specs.append(DeploySpec(args.blueprint_id, args.blueprint_dir, args.deployment_id,
+                                args.application_file or "blueprint.yaml", merged_inputs))
+    elif args.inputs_file or args.application_file:
+        die("--inputs-file/--application-file need --blueprint-id/--blueprint-dir/--deployment-id; "
+            "for --deploy use its inputs_file/application_file keys")
+    specs.extend(_spec_from_json(raw) for raw in args.deploy)
+    if not specs:
+        die("Nothing to deploy. Set --blueprint-id/--blueprint-dir/--deployment-id or --deploy")
+
+    seen_deployments: Set[str] = set()
+    blueprints: Dict[str, DeploySpec] = {}
+    for spec in specs:
+        # fail fast, before any network call
+        if not os.path.isdir(spec.blueprint_dir):
+            die(f"Blueprint directory not found: {spec.blueprint_dir}")
+        if spec.deployment_id in seen_deployments:
+            die(f"Deployment listed more than once: {spec.deployment_id}")
+        seen_deployments.add(spec.deployment_id)
+        other = blueprints.setdefault(spec.blueprint_id, spec)
+        if (other.blueprint_dir, other.application_file) != (spec.blueprint_dir, spec.application_file):
+            die(f"Blueprint '{spec.blueprint_id}' given with different dir/application file")
+    return specs
+
+
+def run_deployment(
+    cfg: CfyConfig,
+    authed: Callable[..., Any],
+    spec: DeploySpec,
+    exists: bool,
+    args: argparse.Namespace,
+) -> None:
+    if not exists:
+        if not args.create_if_missing:
+            raise CloudifyAPIError(f"Deployment missing and create disabled: {spec.deployment_id}")
+        authed(create_deployment, spec.deployment_id, spec.blueprint_id, spec.inputs)
+
+    exec_id = authed(start_execution, spec.deployment_id, args.workflow)
+
+    if args.wait:
+        authed(wait_execution, exec_id)
+
+
 def main() -> None:
     args = parse_args()
+    logging.basicConfig(level=args.log_level, format="%(message)s", stream=sys.stdout)
 
     if not args.manager:
         die("Missing manager URL. Set --manager or CFY_MANAGER_URL")
@@ -379,35 +755,89 @@ def main() -> None:
         request_timeout_sec=args.request_timeout_sec,
         exec_timeout_sec=args.exec_timeout_sec,
         poll_interval_sec=args.poll_interval_sec,
+        token_cache=args.token_cache,
     )
+    cfg.session = build_session(cfg)
 
-    # Merge inputs
-    merged_inputs: Dict[str, Any] = {}
-    for fpath in args.inputs_file:
-        merged_inputs = merge_dicts(merged_inputs, load_yaml_file(fpath))
-
-    # Build zip
-    tmp_zip = f"/tmp/{args.blueprint_id}.zip"
-    build_zip_from_dir(args.blueprint_dir, tmp_zip, root_dir_name=args.blueprint_id)
-    token = login_get_token(cfg)
-
-    upload_blueprint_zip(cfg, token, args.blueprint_id, tmp_zip, args.application_file)
-
-    if not deployment_exists(cfg, token, args.deployment_id):
-        if not args.create_if_missing:
-            die(f"Deployment missing and create disabled: {args.deployment_id}")
-        create_deployment(cfg, token, args.deployment_id, args.blueprint_id, merged_inputs)
+    specs = collect_specs(args)
+    # one zip/upload per distinct blueprint, however many deployments use it
+    blueprints = {spec.blueprint_id: spec for spec in specs}
 
-    exec_id = start_execution(cfg, token, args.deployment_id, args.workflow)
+    token_lock = threading.Lock()
 
-    if args.wait:
-        wait_execution(cfg, token, exec_id)
-
-    # cleanup
-    try:
-        os.remove(tmp_zip)
-    except OSError:
-        pass
+    def authed(fn, *fn_args):
+        # Cached token may have been revoked/expired server-side: re-login once and retry.
+        used = cfg.session.headers.get("Authentication-Token")
+        try:
+            return fn(cfg, *fn_args)
+        except CloudifyAuthError:
+            with token_lock:
+                # another thread may have refreshed it already
+                if cfg.session.headers.get("Authentication-Token") == used:
+                    log("Auth token rejected, re-authenticating...")
+                    _clear_cached_token(cfg)
+                    login_get_token(cfg)
+            return fn(cfg, *fn_args)
+
+    # Independent steps overlap: zip builds run while we authenticate, and the
+    # deployment lookups run while blueprints upload (all share cfg.session).
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL) as pool:
+        zip_futures = {
+            bid: pool.submit(build_zip_from_dir, spec.blueprint_dir, bid) for bid, spec in blueprints.items()
+        }
+
+        token = _load_cached_token(cfg)
+        if token:
+            log("Using cached auth token.")
+            cfg.session.headers["Authentication-Token"] = token
+        else:
+            login_get_token(cfg)
+
+        upload_futures = {
+            bid: pool.submit(authed, ensure_blueprint, bid, zip_futures[bid].result(), spec.application_file)
+            for bid, spec in blueprints.items()
+        }
+        exists_futures = [pool.submit(authed, deployment_exists, spec.deployment_id) for spec in specs]
+
+        # A failure only affects the deployments it belongs to (a failed blueprint upload
+        # fails just the deployments built from it); the rest carry on.
+        errors: List[Tuple[str, CloudifyAPIError]] = []
+
+        def fail(deployment_id: str, e: CloudifyAPIError) -> None:
+            if len(specs) > 1:
+                log(f"Deployment '{deployment_id}' failed: {e}")
+            errors.append((deployment_id, e))
+
+        upload_errors: Dict[str, CloudifyAPIError] = {}
+        for bid, f in upload_futures.items():
+            try:
+                f.result()
+            except CloudifyAPIError as e:
+                upload_errors[bid] = e
+
+        # Deployments (create/start/wait) proceed in parallel.
+        run_futures = []
+        for spec, ef in zip(specs, exists_futures):
+            try:
+                if spec.blueprint_id in upload_errors:
+                    raise upload_errors[spec.blueprint_id]
+                exists = ef.result()
+            except CloudifyAPIError as e:
+                fail(spec.deployment_id, e)
+                continue
+            run_futures.append((spec, pool.submit(run_deployment, cfg, authed, spec, exists, args)))
+
+        for spec, f in run_futures:
+            try:
+                f.result()
+            except CloudifyAPIError as e:
+                fail(spec.deployment_id, e)
+
+    if len(specs) == 1 and errors:
+        raise errors[0][1]
+    if errors:
+        failed = ", ".join(sorted(deployment_id for deployment_id, _ in errors))
+        raise CloudifyAPIError(f"{len(errors)} of {len(specs)} deployments failed: {failed}")
 
 
 if __name__ == "__main__":